@@ -0,0 +1,105 @@
+"""
+UTM (WGS84, EPSG:326xx / 327xx) to lon/lat inverse projection.
+
+Implements the 6th-order Krueger series for the transverse Mercator
+projection (Karney 2011, as used by PROJ's tmerc), which is accurate to well
+under a millimetre within a UTM zone. Compiled with Numba when it is
+installed; otherwise runs as plain Python, which is still much cheaper than
+building a pyproj pipeline for a handful of points.
+"""
+
+import math
+
+try:
+    from numba import njit
+except ImportError:  # Optional: JIT-compile the kernel
+    def njit(*args, **kwargs):
+        def decorator(func):
+            return func
+        return decorator
+
+# WGS84 ellipsoid and UTM constants
+_A = 6378137.0
+_F = 1 / 298.257223563
+_K0 = 0.9996
+_FALSE_EASTING = 500000.0
+_FALSE_NORTHING_SOUTH = 10000000.0
+
+_N = _F / (2 - _F)
+_N2 = _N * _N
+_N3 = _N2 * _N
+_N4 = _N3 * _N
+_N5 = _N4 * _N
+_N6 = _N5 * _N
+
+# Rectifying radius
+_RECT_A = _A / (1 + _N) * (1 + _N2 / 4 + _N4 / 64 + _N6 / 256)
+
+# Series coefficients: transverse Mercator -> Gauss-Schreiber (beta)
+_BETA = (
+    _N / 2 - 2 * _N2 / 3 + 37 * _N3 / 96 - _N4 / 360 - 81 * _N5 / 512 + 96199 * _N6 / 604800,
+    _N2 / 48 + _N3 / 15 - 437 * _N4 / 1440 + 46 * _N5 / 105 - 1118711 * _N6 / 3870720,
+    17 * _N3 / 480 - 37 * _N4 / 840 - 209 * _N5 / 4480 + 5569 * _N6 / 90720,
+    4397 * _N4 / 161280 - 11 * _N5 / 504 - 830251 * _N6 / 7257600,
+    4583 * _N5 / 161280 - 108847 * _N6 / 3991680,
+    20648693 * _N6 / 638668800,
+)
+
+# Series coefficients: conformal latitude -> geodetic latitude (delta)
+_DELTA = (
+    2 * _N - 2 * _N2 / 3 - 2 * _N3 + 116 * _N4 / 45 + 26 * _N5 / 45 - 2854 * _N6 / 675,
+    7 * _N2 / 3 - 8 * _N3 / 5 - 227 * _N4 / 45 + 2704 * _N5 / 315 + 2323 * _N6 / 945,
+    56 * _N3 / 15 - 136 * _N4 / 35 - 1262 * _N5 / 105 + 73814 * _N6 / 2835,
+    4279 * _N4 / 630 - 332 * _N5 / 35 - 399572 * _N6 / 14175,
+    4174 * _N5 / 315 - 144838 * _N6 / 6237,
+    601676 * _N6 / 22275,
+)
+
+
+def is_utm_epsg(epsg):
+    """Return True for WGS84 / UTM north (326xx) and south (327xx) codes."""
+    return 32601 <= epsg <= 32660 or 32701 <= epsg <= 32760
+
+
+@njit(cache=True)
+def utm_to_lonlat(easting, northing, zone, south):
+    """Convert a UTM easting/northing (metres) to (lon, lat) in degrees."""
+    if south:
+        northing = northing - _FALSE_NORTHING_SOUTH
+
+    xi = northing / (_K0 * _RECT_A)
+    eta = (easting - _FALSE_EASTING) / (_K0 * _RECT_A)
+
+    xi_p = xi
+    eta_p = eta
+    for j in range(6):
+        k = 2.0 * (j + 1)
+        xi_p -= _BETA[j] * math.sin(k * xi) * math.cosh(k * eta)
+        eta_p -= _BETA[j] * math.cos(k * xi) * math.sinh(k * eta)
+
+    chi = math.asin(math.sin(xi_p) / math.cosh(eta_p))
+    lat = chi
+    for j in range(6):
+        lat += _DELTA[j] * math.sin(2.0 * (j + 1) * chi)
+
+    lon0 = math.radians(zone * 6.0 - 183.0)
+    lon = math.degrees(lon0 + math.atan2(math.sinh(eta_p), math.cos(xi_p)))
+    if lon > 180.0:
+        lon -= 360.0
+    elif lon < -180.0:
+        lon += 360.0
+    return lon, math.degrees(lat)
+
+
+@njit(cache=True)
+def utm_bounds_to_lonlat(left, bottom, right, top, zone, south):
+    """Transform projected bounds to (lon_min, lat_min, lon_max, lat_max) via the corners."""
+    lon_min = lat_min = math.inf
+    lon_max = lat_max = -math.inf
+    for x, y in ((left, bottom), (left, top), (right, bottom), (right, top)):
+        lon, lat = utm_to_lonlat(x, y, zone, south)
+        lon_min = min(lon_min, lon)
+        lon_max = max(lon_max, lon)
+        lat_min = min(lat_min, lat)
+        lat_max = max(lat_max, lat)
+    return lon_min, lat_min, lon_max, lat_max
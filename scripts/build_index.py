@@ -4,43 +4,346 @@ Generate location index for SSL4EO-L dataset.
 Scans all samples and creates a JSON file mapping sample_id -> [lat, lon].
 Run this once after downloading to enable the map-click-to-nearest-sample feature.
 
-Uses thread pool for speed (~20 workers).
+With --format binary, writes locations.bin instead: a packed array of
+LOCATION_DTYPE records (15 bytes per sample) that can be opened in O(1) with
+np.memmap(path, dtype=LOCATION_DTYPE, mode='r').
+
+Uses a process pool for speed (one worker per CPU by default); pass
+--executor thread on distributed filesystems where many processes hurt.
+
+Bounds and CRS are parsed straight from the GeoTIFF header where possible,
+falling back to rasterio for files the fast path does not understand.
+
+Also writes samples_<split>.txt (sorted sample IDs, one per line) next to the
+index, which the viewer reads instead of listing the split directory.
+
+With --sample-info, also writes sample_info_<split>.json next to the index: WGS84
+bounds and timestamp names per sample, which the viewer serves instead of
+opening each sample's GeoTIFF.
+
+With --build-overviews, also writes a .ovr overview pyramid next to every
+GeoTIFF so previews can be read at reduced resolution cheaply (see
+view_samples.py --size).
+
+GDAL options applied while indexing (see GDAL_ENV):
+    GDAL_DISABLE_READDIR_ON_OPEN=EMPTY_DIR  don't list each directory looking
+                                            for .aux.xml/.ovr/.tfw sidecars
+    GDAL_CACHEMAX=64                        small block cache, only headers are read
+    CPL_VSIL_CURL_ALLOWED_EXTENSIONS=.tif   restrict probing for /vsicurl/ roots
 """
 
 import argparse
 import json
+import os
+import struct
 import sys
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache, partial
 from pathlib import Path
 
+import numpy as np
 import rasterio
+from pyproj import CRS, Transformer
+from rasterio.enums import Resampling
+from rasterio.errors import RasterioIOError
 from rasterio.warp import transform_bounds
 
+from _utm_inverse import is_utm_epsg, utm_bounds_to_lonlat
+
+try:
+    import orjson
+except ImportError:  # Optional: faster JSON serialization
+    orjson = None
+
+GDAL_ENV = {
+    'GDAL_DISABLE_READDIR_ON_OPEN': 'EMPTY_DIR',
+    'GDAL_CACHEMAX': 64,
+    'CPL_VSIL_CURL_ALLOWED_EXTENSIONS': '.tif',
+}
+
+# Overview levels written with --build-overviews (264px -> 132/66/33px)
+OVERVIEW_FACTORS = [2, 4, 8]
+
+# Record layout for --format binary (SSL4EO-L sample IDs are 7 digits)
+LOCATION_DTYPE = np.dtype([('id', 'S7'), ('lat', '<f4'), ('lon', '<f4')])
+
+# TIFF / GeoTIFF tags and keys used by the header fast path
+TAG_IMAGE_WIDTH = 256
+TAG_IMAGE_LENGTH = 257
+TAG_MODEL_PIXEL_SCALE = 33550
+TAG_MODEL_TIEPOINT = 33922
+TAG_GEO_KEY_DIRECTORY = 34735
+
+GEOKEY_MODEL_TYPE = 1024
+GEOKEY_RASTER_TYPE = 1025
+GEOKEY_GEOGRAPHIC_TYPE = 2048
+GEOKEY_PROJECTED_CS_TYPE = 3072
+
+# TIFF field type -> (struct format, byte size)
+TIFF_TYPES = {
+    3: ("H", 2),   # SHORT
+    4: ("I", 4),   # LONG
+    12: ("d", 8),  # DOUBLE
+}
+
+
+@lru_cache(maxsize=128)
+def _get_transformer(epsg):
+    """Return a (cached) transformer from the given EPSG code to WGS84 lon/lat.
+
+    Building the PROJ pipeline is far more expensive than running it, and
+    samples fall into a small number of UTM zones, so one Transformer per
+    EPSG code is shared by all samples handled by a worker process (or by
+    all threads with --executor thread).
+    """
+    return Transformer.from_crs(CRS.from_epsg(epsg), 4326, always_xy=True)
+
+
+def warm_up():
+    """Load (or JIT-compile) the UTM kernel before the first sample needs it."""
+    utm_bounds_to_lonlat(0.0, 0.0, 1.0, 1.0, 31, False)
+
+
+def _read_geotiff_bounds(path):
+    """Read bounds and EPSG code directly from a GeoTIFF header.
+
+    Only handles the simple case written for SSL4EO-L: classic (non-Big)
+    TIFF, north-up tiepoint + pixel scale georeferencing, PixelIsArea, and
+    an EPSG-coded CRS. Returns ((left, bottom, right, top), epsg) or None if
+    the file needs the full rasterio path.
+    """
+    with open(path, 'rb') as f:
+        header = f.read(8)
+        if len(header) < 8:
+            return None
+        if header[:2] == b'II':
+            endian = '<'
+        elif header[:2] == b'MM':
+            endian = '>'
+        else:
+            return None
+        magic, ifd_offset = struct.unpack(endian + 'HI', header[2:8])
+        if magic != 42:
+            return None
+
+        f.seek(ifd_offset)
+        (num_entries,) = struct.unpack(endian + 'H', f.read(2))
+        ifd = f.read(num_entries * 12)
+
+        wanted = (TAG_IMAGE_WIDTH, TAG_IMAGE_LENGTH, TAG_MODEL_PIXEL_SCALE,
+                  TAG_MODEL_TIEPOINT, TAG_GEO_KEY_DIRECTORY)
+        tags = {}
+        for i in range(num_entries):
+            tag, field_type, count = struct.unpack(endian + 'HHI', ifd[i*12:i*12 + 8])
+            if tag not in wanted:
+                continue
+            if field_type not in TIFF_TYPES:
+                return None
+            fmt, size = TIFF_TYPES[field_type]
+            nbytes = count * size
+            if nbytes <= 4:
+                raw = ifd[i*12 + 8:i*12 + 8 + nbytes]
+            else:
+                (value_offset,) = struct.unpack(endian + 'I', ifd[i*12 + 8:i*12 + 12])
+                f.seek(value_offset)
+                raw = f.read(nbytes)
+            tags[tag] = struct.unpack(endian + fmt * count, raw)
+
+    if any(tag not in tags for tag in wanted):
+        return None
+
+    # GeoKey directory: 4-short header, then (key, location, count, value) entries.
+    # Keys we need are stored inline (location == 0).
+    geo_dir = tags[TAG_GEO_KEY_DIRECTORY]
+    geo_keys = {}
+    for i in range(geo_dir[3]):
+        key, location, _, value = geo_dir[4 + i*4:8 + i*4]
+        if location == 0:
+            geo_keys[key] = value
+
+    if geo_keys.get(GEOKEY_RASTER_TYPE, 1) != 1:
+        return None  # PixelIsPoint needs GDAL's half-pixel shift
+    if geo_keys.get(GEOKEY_MODEL_TYPE) == 2:
+        epsg = geo_keys.get(GEOKEY_GEOGRAPHIC_TYPE)
+    else:
+        epsg = geo_keys.get(GEOKEY_PROJECTED_CS_TYPE)
+    if epsg is None or epsg == 32767:
+        return None  # User-defined CRS
+
+    width = tags[TAG_IMAGE_WIDTH][0]
+    height = tags[TAG_IMAGE_LENGTH][0]
+    scale_x, scale_y = tags[TAG_MODEL_PIXEL_SCALE][:2]
+    i, j, _, x, y, _ = tags[TAG_MODEL_TIEPOINT][:6]
+
+    left = x - i * scale_x
+    top = y + j * scale_y
+    return (left, top - height * scale_y, left + width * scale_x, top), epsg
+
+
+def lonlat_bounds(bounds, epsg):
+    """Transform projected bounds to WGS84 (lon_min, lat_min, lon_max, lat_max).
+
+    UTM zones (almost all of SSL4EO-L) go through the closed-form inverse in
+    _utm_inverse; anything else uses the cached pyproj Transformer.
+    """
+    if is_utm_epsg(epsg):
+        zone, south = epsg % 100, epsg > 32700
+        return utm_bounds_to_lonlat(*bounds, zone, south)
+    return _get_transformer(epsg).transform_bounds(*bounds)
 
-def get_sample_center(sample_dir_str):
-    """Get center coordinates for a sample by reading its first GeoTIFF."""
-    sample_dir = Path(sample_dir_str)
-    sample_id = sample_dir.name
-
-    for ts_dir in sample_dir.iterdir():
-        if ts_dir.is_dir():
-            tif_path = ts_dir / "all_bands.tif"
-            if tif_path.exists():
-                try:
-                    with rasterio.open(tif_path) as src:
-                        bounds = src.bounds
-                        crs = src.crs
-                        lon_min, lat_min, lon_max, lat_max = transform_bounds(
-                            crs, 'EPSG:4326',
-                            bounds.left, bounds.bottom, bounds.right, bounds.top
-                        )
-                        center_lat = (lat_min + lat_max) / 2
-                        center_lon = (lon_min + lon_max) / 2
-                        return sample_id, [center_lat, center_lon], None
-                except Exception as e:
-                    return sample_id, None, str(e)
-
-    return sample_id, None, "No valid GeoTIFF"
+
+def dataset_lonlat_bounds(src):
+    """Return WGS84 (lon_min, lat_min, lon_max, lat_max) of an open rasterio dataset."""
+    bounds = src.bounds
+    crs = src.crs
+    epsg = crs.to_epsg()
+    if epsg is not None:
+        return lonlat_bounds(tuple(bounds), epsg)
+
+    # Non-EPSG CRS: no cache key, build the pipeline once
+    return transform_bounds(
+        crs, 'EPSG:4326',
+        bounds.left, bounds.bottom, bounds.right, bounds.top
+    )
+
+
+def dataset_center(src):
+    """Return [lat, lon] of the center of an open rasterio dataset."""
+    lon_min, lat_min, lon_max, lat_max = dataset_lonlat_bounds(src)
+    center_lat = (lat_min + lat_max) / 2
+    center_lon = (lon_min + lon_max) / 2
+    return [center_lat, center_lon]
+
+
+def build_overviews(tif_path):
+    """Write an external .ovr overview pyramid (2x/4x/8x) next to a GeoTIFF.
+
+    TIFF_USE_OVR keeps GDAL from appending the overviews inside the original
+    file, so the dataset itself is left untouched. GDAL_ENV's EMPTY_DIR would
+    hide an existing .ovr and make every rerun append another pyramid; TRUE
+    still finds sidecars by a direct stat, so reruns regenerate it in place.
+    """
+    with rasterio.Env(GDAL_DISABLE_READDIR_ON_OPEN='TRUE', TIFF_USE_OVR=True,
+                      COMPRESS_OVERVIEW='DEFLATE'):
+        with rasterio.open(tif_path, 'r+', driver='GTiff') as dst:
+            dst.build_overviews(OVERVIEW_FACTORS, Resampling.average)
+
+
+def get_sample_center(sample_dir_str, with_overviews=False, with_info=False):
+    """Get center coordinates for a sample by reading its first GeoTIFF.
+
+    Returns (sample_id, coords, info, error). With with_info, info holds the
+    WGS84 bounds and timestamp names the viewer's /api/sample/<id> serves;
+    with with_overviews, also builds overviews for every timestamp's GeoTIFF.
+    Timestamps come from the directory listing, minus any GeoTIFF found
+    missing while opening files, so no extra stat is made per file.
+    """
+    sample_id = os.path.basename(sample_dir_str)
+
+    # scandir caches the entry type from the directory read, and opening the
+    # file directly (rather than checking exists() first) saves another stat
+    with os.scandir(sample_dir_str) as entries:
+        tif_paths = sorted(os.path.join(e.path, "all_bands.tif")
+                           for e in entries if e.is_dir(follow_symlinks=False))
+
+    lonlat = None
+    missing = set()
+    for tif_path in tif_paths:
+        try:
+            header = _read_geotiff_bounds(tif_path)
+            if header is not None:
+                lonlat = lonlat_bounds(*header)
+            else:
+                # Fallback: let GDAL handle anything the header parser can't
+                with rasterio.open(tif_path, driver='GTiff') as src:
+                    lonlat = dataset_lonlat_bounds(src)
+            break
+        except FileNotFoundError:
+            missing.add(tif_path)
+            continue
+        except Exception as e:
+            return sample_id, None, None, str(e)
+
+    if lonlat is None:
+        return sample_id, None, None, "No valid GeoTIFF"
+
+    lon_min, lat_min, lon_max, lat_max = lonlat
+    coords = [(lat_min + lat_max) / 2, (lon_min + lon_max) / 2]
+
+    error = None
+    if with_overviews:
+        for tif_path in tif_paths:
+            if tif_path in missing:
+                continue
+            try:
+                build_overviews(tif_path)
+            except RasterioIOError:
+                if not os.path.exists(tif_path):
+                    missing.add(tif_path)
+                elif error is None:
+                    error = f"Overviews failed for {tif_path}"
+            except Exception as e:
+                if error is None:
+                    error = f"Overviews failed for {tif_path}: {e}"
+
+    info = None
+    if with_info:
+        info = {
+            'bounds': {
+                'lat_min': lat_min,
+                'lat_max': lat_max,
+                'lon_min': lon_min,
+                'lon_max': lon_max,
+                'center_lat': coords[0],
+                'center_lon': coords[1]
+            },
+            'timestamps': [os.path.basename(os.path.dirname(p))
+                           for p in tif_paths if p not in missing]
+        }
+
+    return sample_id, coords, info, error
+
+
+def write_binary_index(location_index, output_path):
+    """Write the index as packed LOCATION_DTYPE records, sorted by sample ID."""
+    sample_ids = sorted(location_index)
+    too_long = [s for s in sample_ids if len(s) > LOCATION_DTYPE['id'].itemsize]
+    if too_long:
+        raise ValueError(f"Sample IDs too long for binary index: {too_long[:5]}")
+
+    records = np.empty(len(sample_ids), dtype=LOCATION_DTYPE)
+    records['id'] = sample_ids
+    coords = np.array([location_index[s] for s in sample_ids], dtype=np.float32).reshape(-1, 2)
+    records['lat'] = coords[:, 0]
+    records['lon'] = coords[:, 1]
+    records.tofile(output_path)
+
+
+def write_json(obj, output_path):
+    """Write obj as compact JSON in a single write (orjson when available)."""
+    if orjson is not None:
+        output_path.write_bytes(orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY))
+    else:
+        output_path.write_text(json.dumps(obj, separators=(',', ':')))
+
+
+def write_index(location_index, output_path, fmt='json'):
+    """Write the location index as JSON or packed binary records."""
+    if fmt == 'binary':
+        write_binary_index(location_index, output_path)
+    else:
+        write_json(location_index, output_path)
+
+
+def init_worker(gdal_env=GDAL_ENV):
+    """Set up a worker process: enter gdal_env and warm up the UTM kernel.
+
+    Neither the parent's rasterio.Env config nor its loaded kernel is
+    inherited by processes started with the spawn method (macOS/Windows).
+    """
+    rasterio.Env(**gdal_env).__enter__()
+    warm_up()
 
 
 def main():
@@ -50,51 +353,89 @@ def main():
     parser.add_argument('--split', type=str, default='ssl4eo_l_oli_sr',
                         help='Dataset split to use')
     parser.add_argument('--output', type=str, default=None,
-                        help='Output JSON file path (default: <root>/locations.json)')
-    parser.add_argument('--workers', type=int, default=20,
-                        help='Number of parallel workers')
+                        help='Output file path (default: <root>/locations.json, '
+                             'or <root>/locations.bin with --format binary)')
+    parser.add_argument('--format', choices=['json', 'binary'], default='json',
+                        help='Index format: json (default) or packed binary records')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='Number of parallel workers (default: CPU count)')
+    parser.add_argument('--executor', choices=['process', 'thread'], default='process',
+                        help='Worker pool type (default: process; use thread on '
+                             'distributed filesystems)')
+    parser.add_argument('--build-overviews', action='store_true',
+                        help='Also write 2x/4x/8x .ovr overviews next to every GeoTIFF '
+                             '(reads all pixels, much slower than indexing alone)')
+    parser.add_argument('--sample-info', action='store_true',
+                        help='Also write sample_info_<split>.json (bounds + timestamps per sample) '
+                             'next to the index, so the viewer never opens GeoTIFFs for metadata')
 
     args = parser.parse_args()
 
     data_dir = Path(args.root) / args.split
     output_path = Path(args.output) if args.output else Path(args.root) / "locations.json"
+    if args.format == 'binary':
+        output_path = output_path.with_suffix('.bin')
 
     if not data_dir.exists():
         print(f"Error: Data directory not found: {data_dir}")
         sys.exit(1)
 
     # Get all sample directories
-    sample_dirs = [str(d) for d in data_dir.iterdir() if d.is_dir()]
+    with os.scandir(data_dir) as entries:
+        sample_dirs = [e.path for e in entries if e.is_dir()]
     total = len(sample_dirs)
-    print(f"Found {total} samples. Processing with {args.workers} workers...")
+    print(f"Found {total} samples. Processing with {args.workers} {args.executor} workers...")
+
+    # Compile/load the UTM kernel up front instead of on first use inside workers
+    warm_start = time.time()
+    warm_up()
+    print(f"Warmed up UTM kernel in {time.time() - warm_start:.2f}s")
 
     # Build location index in parallel
     location_index = {}
+    sample_info = {}
     errors = []
     completed = 0
 
-    with ThreadPoolExecutor(max_workers=args.workers) as executor:
-        futures = {executor.submit(get_sample_center, d): d for d in sample_dirs}
+    if args.executor == 'process':
+        executor = ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker)
+    else:
+        executor = ThreadPoolExecutor(max_workers=args.workers)
 
-        for future in as_completed(futures):
-            sample_id, coords, error = future.result()
+    with rasterio.Env(**GDAL_ENV), executor:
+        # Chunking amortizes inter-process overhead over batches of samples
+        worker = partial(get_sample_center, with_overviews=args.build_overviews,
+                         with_info=args.sample_info)
+        results = executor.map(worker, sample_dirs, chunksize=64)
+
+        for sample_id, coords, info, error in results:
             completed += 1
 
             if coords:
                 location_index[sample_id] = coords
-            elif error:
+            if info:
+                sample_info[sample_id] = info
+            if error:
                 errors.append(f"{sample_id}: {error}")
 
             # Print progress every 5000 samples
             if completed % 5000 == 0 or completed == total:
                 print(f"Progress: {completed}/{total} ({100*completed//total}%)")
 
-    # Save to JSON
-    with open(output_path, 'w') as f:
-        json.dump(location_index, f)
+    write_index(location_index, output_path, args.format)
 
     print(f"Done! Indexed {len(location_index)} samples -> {output_path}")
 
+    # Sorted sample listing, so the viewer doesn't have to scan the split directory
+    samples_path = output_path.with_name(f"samples_{args.split}.txt")
+    samples_path.write_text("".join(f"{os.path.basename(d)}\n" for d in sorted(sample_dirs)))
+    print(f"      Sample list -> {samples_path}")
+
+    if args.sample_info:
+        info_path = output_path.with_name(f"sample_info_{args.split}.json")
+        write_json(sample_info, info_path)
+        print(f"      Sample info -> {info_path}")
+
     if errors:
         print(f"Warnings: {len(errors)} samples had issues")
 
@@ -13,11 +13,17 @@ Usage:
 """
 
 import argparse
+import os
 import sys
 import time
 import shutil
+import subprocess
+import queue
+import threading
+from functools import partial
 from pathlib import Path
-from datetime import datetime, timedelta
+from datetime import datetime
+from typing import Optional
 
 
 AVAILABLE_SPLITS = ["tm_toa", "etm_toa", "etm_sr", "oli_tirs_toa", "oli_sr"]
@@ -71,13 +77,16 @@ SPLIT_INFO = {
 }
 
 
+SIZE_UNITS = ("B", "KB", "MB", "GB", "TB", "PB")
+
+
 def format_size(bytes_size: float) -> str:
     """Format bytes to human readable size."""
-    for unit in ["B", "KB", "MB", "GB", "TB"]:
-        if bytes_size < 1024:
-            return f"{bytes_size:.2f} {unit}"
-        bytes_size /= 1024
-    return f"{bytes_size:.2f} PB"
+    if bytes_size < 1024:
+        return f"{bytes_size:.2f} B"
+    # Unit index straight from the bit length: 2**10 per unit step
+    exponent = min((int(bytes_size).bit_length() - 1) // 10, len(SIZE_UNITS) - 1)
+    return f"{bytes_size / (1 << (10 * exponent)):.2f} {SIZE_UNITS[exponent]}"
 
 
 def format_time(seconds: float) -> str:
@@ -97,12 +106,12 @@ def format_eta(seconds: float) -> str:
     if seconds <= 0:
         return "calculating..."
 
-    td = timedelta(seconds=int(seconds))
-    hours, remainder = divmod(td.seconds, 3600)
+    days, remainder = divmod(int(seconds), 86400)
+    hours, remainder = divmod(remainder, 3600)
     minutes, secs = divmod(remainder, 60)
 
-    if td.days > 0:
-        return f"{td.days}d {hours}h {minutes}m"
+    if days > 0:
+        return f"{days}d {hours}h {minutes}m"
     elif hours > 0:
         return f"{hours}h {minutes}m {secs}s"
     elif minutes > 0:
@@ -111,13 +120,21 @@ def format_eta(seconds: float) -> str:
         return f"{secs}s"
 
 
-def get_directory_size(path: Path) -> int:
-    """Get total size of a directory in bytes."""
+def get_parts_size(root: Path, split: str) -> int:
+    """Get total bytes of a split's downloaded tarball parts (ssl4eo_l_<split>.tar.gz<suffix>).
+
+    Only the root directory is listed, never the extracted tree. The joined
+    ssl4eo_l_<split>.tar.gz that TorchGeo's extractor writes is not a part.
+    """
+    prefix = f"ssl4eo_l_{split}.tar.gz"
     total = 0
-    if path.exists():
-        for f in path.rglob("*"):
-            if f.is_file():
-                total += f.stat().st_size
+    try:
+        with os.scandir(root) as entries:
+            for entry in entries:
+                if entry.name.startswith(prefix) and entry.name != prefix and entry.is_file():
+                    total += entry.stat().st_size
+    except OSError:
+        pass
     return total
 
 
@@ -131,8 +148,65 @@ def check_disk_space(path: Path, required_gb: float) -> tuple[bool, float]:
         return True, -1  # Assume OK if we can't check
 
 
+def resolve_extractor(extractor: str) -> str:
+    """Resolve 'auto' to 'tar' when system tar is usable, else 'torchgeo'."""
+    if extractor != "auto":
+        return extractor
+    if os.name == "posix" and shutil.which("tar") and shutil.which("cat"):
+        return "tar"
+    return "torchgeo"
+
+
+def stream_extract(parts: list[str], dest: str) -> None:
+    """Extract split tarball parts with system tar, streaming them in order.
+
+    TorchGeo first concatenates all parts into one full-size .tar.gz and then
+    extracts it with Python's single-threaded tarfile. Piping the parts
+    straight into tar skips that extra copy of the whole split, and pigz
+    (multi-threaded gzip) is used for decompression when installed.
+    """
+    cat = subprocess.Popen(["cat", *parts], stdout=subprocess.PIPE)
+    procs = [cat]
+    if shutil.which("pigz"):
+        gunzip = subprocess.Popen(["pigz", "-dc"], stdin=cat.stdout, stdout=subprocess.PIPE)
+        cat.stdout.close()  # Let cat see SIGPIPE if pigz exits early
+        procs.append(gunzip)
+        tar_cmd = ["tar", "-xf", "-", "-C", dest]
+    else:
+        tar_cmd = ["tar", "-xzf", "-", "-C", dest]
+
+    tar = subprocess.run(tar_cmd, stdin=procs[-1].stdout)
+    procs[-1].stdout.close()
+    for proc in procs:
+        proc.wait()
+
+    failed = [p.args[0] for p in procs + [tar] if p.returncode != 0]
+    if failed:
+        raise RuntimeError(f"Extraction failed ({', '.join(failed)} exited with an error)")
+
+
+def extraction_worker(jobs: queue.Queue, results: dict) -> None:
+    """Run queued (split, extract) jobs one at a time until a None sentinel arrives."""
+    while (job := jobs.get()) is not None:
+        split, extract = job
+        start = time.time()
+        print(f"\n[extract] {split}: started")
+        try:
+            extract()
+            results[split] = True
+            print(f"\n[extract] {split}: done in {format_eta(time.time() - start)}")
+        except Exception as e:
+            results[split] = False
+            print(f"\n[extract] {split}: failed: {e}")
+
+
 class DownloadProgressMonitor:
-    """Monitor download progress by watching directory size."""
+    """Monitor download progress by watching the split's tarball parts.
+
+    Progress is the growth in size of the parts being written under root
+    since start(), so other writers on the filesystem (such as the previous
+    split's background extraction) are not counted.
+    """
 
     def __init__(self, root: Path, split: str, expected_size_gb: float):
         self.root = root
@@ -141,18 +215,22 @@ class DownloadProgressMonitor:
         self.start_time = None
         self.start_size = 0
 
+        # Progress bar strings for every fill level, built once
+        width = 30
+        self._bars = ["=" * filled + ">" + " " * (width - filled - 1) for filled in range(width + 1)]
+
     def start(self):
         """Start monitoring."""
         self.start_time = time.time()
-        self.start_size = get_directory_size(self.root)
+        self.start_size = get_parts_size(self.root, self.split)
 
     def get_progress(self) -> dict:
         """Get current progress stats."""
         if self.start_time is None:
             return {"progress": 0, "speed": 0, "eta": -1, "downloaded": 0}
 
-        current_size = get_directory_size(self.root)
-        downloaded = current_size - self.start_size
+        current_size = get_parts_size(self.root, self.split)
+        downloaded = max(current_size - self.start_size, 0)
         elapsed = time.time() - self.start_time
 
         # Calculate speed (bytes per second)
@@ -178,9 +256,7 @@ class DownloadProgressMonitor:
         """Print current status."""
         stats = self.get_progress()
 
-        progress_bar_width = 30
-        filled = int(progress_bar_width * stats["progress"] / 100)
-        bar = "=" * filled + ">" + " " * (progress_bar_width - filled - 1)
+        bar = self._bars[int((len(self._bars) - 1) * stats["progress"] / 100)]
 
         status = (
             f"\r[{bar}] {stats['progress']:.1f}% | "
@@ -233,16 +309,23 @@ def download_split(
     root: str,
     seasons: int,
     checksum: bool,
-    dry_run: bool
+    dry_run: bool,
+    extractor: str = "auto",
+    extract_queue: Optional[queue.Queue] = None,
 ) -> bool:
-    """Download a single split."""
-    import threading
+    """Download a single split.
+
+    If extract_queue is given, extraction is handed to the queue (blocking while
+    it is full) instead of running before this returns.
+    """
+    extractor = resolve_extractor(extractor)
 
     if dry_run:
         print(f"[DRY RUN] Would download: {split}")
         print(f"          Root: {root}")
         print(f"          Seasons: {seasons}")
         print(f"          Checksum: {checksum}")
+        print(f"          Extractor: {extractor}")
         return True
 
     # Check disk space first
@@ -262,6 +345,24 @@ def download_split(
     try:
         from torchgeo.datasets import SSL4EOL
 
+        class ConfiguredSSL4EOL(SSL4EOL):
+            """SSL4EOL using the selected extractor, optionally deferred to extract_queue."""
+
+            def _extract(self) -> None:
+                if extractor == "tar":
+                    parts = [self.subdir + f".tar.gz{suffix}" for suffix in self.checksums[self.split]]
+                    extract = partial(stream_extract, parts, self.root)
+                else:
+                    extract = partial(SSL4EOL._extract, self)
+
+                if extract_queue is None:
+                    extract()
+                else:
+                    # __init__ lists subdir right after this; extraction fills it later
+                    os.makedirs(self.subdir, exist_ok=True)
+                    extract_queue.put((split, extract))
+                    self.extraction_queued = True
+
         print(f"\n{'='*70}")
         print(f"DOWNLOADING: {split.upper()}")
         print(f"{'='*70}")
@@ -273,6 +374,7 @@ def download_split(
         print(f"  Root:         {root}")
         print(f"  Seasons:      {seasons}")
         print(f"  Checksum:     {checksum}")
+        print(f"  Extractor:    {extractor}")
         print(f"  Started at:   {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         print("-" * 70)
 
@@ -285,7 +387,7 @@ def download_split(
             monitor.start()
             while not stop_monitoring.is_set():
                 monitor.print_status()
-                time.sleep(2)  # Update every 2 seconds
+                stop_monitoring.wait(2)  # Update every 2 seconds
             # Final status
             monitor.print_status()
             print()  # New line after progress bar
@@ -296,7 +398,7 @@ def download_split(
 
         # Actually download
         download_start = time.time()
-        dataset = SSL4EOL(
+        dataset = ConfiguredSSL4EOL(
             root=root,
             split=split,
             seasons=seasons,
@@ -310,13 +412,17 @@ def download_split(
         monitor_thread.join(timeout=5)
 
         # Final stats
-        final_size = get_directory_size(root_path)
+        # Growth of the tarball parts since start, rather than walking the extracted tree
+        final_size = monitor.get_progress()["downloaded"]
         print(f"\n{'='*70}")
         print(f"COMPLETED: {split.upper()}")
         print(f"{'='*70}")
-        print(f"  Dataset length:   {len(dataset):,} samples")
+        if getattr(dataset, "extraction_queued", False):
+            print("  Extraction:       queued (runs alongside the next download)")
+        else:
+            print(f"  Dataset length:   {len(dataset):,} samples")
         print(f"  Download time:    {format_eta(download_time)}")
-        print(f"  Total size:       {format_size(final_size)}")
+        print(f"  Downloaded:       {format_size(final_size)}")
         print(f"  Finished at:      {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
 
         # Print sample info
@@ -400,6 +506,23 @@ Available splits:
         help="Verify checksums after download (slower but safer)"
     )
 
+    parser.add_argument(
+        "--extractor",
+        choices=["auto", "tar", "torchgeo"],
+        default="auto",
+        help="How to extract downloaded tarballs: stream parts into system tar "
+             "(with pigz if installed), or TorchGeo's built-in extraction "
+             "(default: auto, tar when available)"
+    )
+
+    parser.add_argument(
+        "--sequential",
+        action="store_true",
+        help="Fully download and extract each split before starting the next "
+             "(default for multiple splits: extract in the background while "
+             "the next split downloads)"
+    )
+
     parser.add_argument(
         "--dry-run",
         action="store_true",
@@ -456,6 +579,18 @@ Available splits:
     success_count = 0
     failed_splits = []
 
+    # Overlap extraction of one split with the download of the next. The
+    # bounded queue keeps at most two extractions pending so extraction
+    # can't fall arbitrarily far behind and fill the disk with tarballs.
+    pipelined = len(splits) > 1 and not args.sequential and not args.dry_run
+    extract_queue = queue.Queue(maxsize=2) if pipelined else None
+    extract_results = {}
+    if pipelined:
+        extract_thread = threading.Thread(
+            target=extraction_worker, args=(extract_queue, extract_results), daemon=True)
+        extract_thread.start()
+
+    downloaded = []
     for split in splits:
         success = download_split(
             split=split,
@@ -463,8 +598,22 @@ Available splits:
             seasons=args.seasons,
             checksum=args.checksum,
             dry_run=args.dry_run,
+            extractor=args.extractor,
+            extract_queue=extract_queue,
         )
         if success:
+            downloaded.append(split)
+        else:
+            failed_splits.append(split)
+
+    if pipelined:
+        print("Waiting for background extraction to finish...")
+        extract_queue.put(None)
+        extract_thread.join()
+
+    for split in downloaded:
+        # Splits that were already extracted never reach the queue
+        if extract_results.get(split, True):
             success_count += 1
         else:
             failed_splits.append(split)
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Scan SSL4EO-L samples once to build both the location index and a thumbnail cache.
+Opens each sample's first GeoTIFF a single time and, from the same dataset handle:
+  - records the sample center (same as build_index.py -> locations.json)
+  - reads bands 4/3/2 decimated to a small thumbnail (GDAL uses internal
+    overviews, or the external .ovr from build_index.py --build-overviews,
+    when the file has them) and stores it in thumbnails.npy
+
+thumbnails.npy is an (N, size, size, 3) uint8 array in the same 2-98% stretch
+as view_samples.py; row i belongs to line i of thumbnails_ids.txt. Open it with
+np.load(path, mmap_mode='r'). Samples that fail to read get an all-zero row.
+
+Use this instead of build_index.py when thumbnails are wanted too; when only
+locations are needed, build_index.py's header-only fast path is cheaper.
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import rasterio
+from rasterio.enums import Resampling
+from rasterio.errors import RasterioIOError
+
+from build_index import GDAL_ENV, dataset_center, init_worker, warm_up, write_index
+from view_samples import normalize_rgb
+
+# GDAL_ENV's EMPTY_DIR hides external .ovr sidecars; TRUE still finds them by
+# a direct stat (without listing the directory), so thumbnails use overviews
+SCAN_GDAL_ENV = {**GDAL_ENV, 'GDAL_DISABLE_READDIR_ON_OPEN': 'TRUE'}
+
+
+def scan_sample(sample_dir_str, thumb_size=33):
+    """Get center coordinates and an RGB thumbnail for a sample from one open."""
+    sample_id = os.path.basename(sample_dir_str)
+
+    with os.scandir(sample_dir_str) as entries:
+        ts_dirs = sorted(e.path for e in entries if e.is_dir(follow_symlinks=False))
+
+    for ts_dir in ts_dirs:
+        tif_path = os.path.join(ts_dir, "all_bands.tif")
+        try:
+            with rasterio.open(tif_path, driver='GTiff') as src:
+                coords = dataset_center(src)
+                rgb = src.read(indexes=[4, 3, 2], out_shape=(3, thumb_size, thumb_size),
+                               resampling=Resampling.average)
+            return sample_id, coords, normalize_rgb(rgb), None
+        except RasterioIOError as e:
+            if not os.path.exists(tif_path):
+                continue
+            return sample_id, None, None, str(e)
+        except Exception as e:
+            return sample_id, None, None, str(e)
+
+    return sample_id, None, None, "No valid GeoTIFF"
+
+
+def _scan_sample_job(job):
+    """Unpack a (sample_dir, thumb_size) job; top-level so it can be pickled."""
+    return scan_sample(*job)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Build location index and thumbnail cache for SSL4EO-L in one pass')
+    parser.add_argument('--root', type=str, default='./data',
+                        help='Root directory containing the dataset')
+    parser.add_argument('--split', type=str, default='ssl4eo_l_oli_sr',
+                        help='Dataset split to use')
+    parser.add_argument('--output-dir', type=str, default=None,
+                        help='Directory for locations/thumbnails files (default: <root>)')
+    parser.add_argument('--format', choices=['json', 'binary'], default='json',
+                        help='Location index format: json (default) or packed binary records')
+    parser.add_argument('--thumb-size', type=int, default=33,
+                        help='Thumbnail width/height in pixels (default: 33, i.e. 1/8 of 264)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='Number of parallel workers (default: CPU count)')
+    parser.add_argument('--executor', choices=['process', 'thread'], default='process',
+                        help='Worker pool type (default: process; use thread on '
+                             'distributed filesystems)')
+
+    args = parser.parse_args()
+
+    data_dir = Path(args.root) / args.split
+    output_dir = Path(args.output_dir) if args.output_dir else Path(args.root)
+    index_path = output_dir / ("locations.bin" if args.format == 'binary' else "locations.json")
+
+    if not data_dir.exists():
+        print(f"Error: Data directory not found: {data_dir}")
+        sys.exit(1)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    # Sorted so thumbnail rows line up with thumbnails_ids.txt
+    with os.scandir(data_dir) as entries:
+        sample_dirs = sorted(e.path for e in entries if e.is_dir())
+    total = len(sample_dirs)
+    if not total:
+        print(f"Error: No samples found in {data_dir}")
+        sys.exit(1)
+    print(f"Found {total} samples. Processing with {args.workers} {args.executor} workers...")
+
+    warm_start = time.time()
+    warm_up()
+    print(f"Warmed up UTM kernel in {time.time() - warm_start:.2f}s")
+
+    thumbnails = np.lib.format.open_memmap(
+        output_dir / "thumbnails.npy", mode='w+', dtype=np.uint8,
+        shape=(total, args.thumb_size, args.thumb_size, 3))
+
+    location_index = {}
+    sample_ids = []
+    errors = []
+
+    if args.executor == 'process':
+        executor = ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker,
+                                       initargs=(SCAN_GDAL_ENV,))
+    else:
+        executor = ThreadPoolExecutor(max_workers=args.workers)
+
+    with rasterio.Env(**SCAN_GDAL_ENV), executor:
+        jobs = ((d, args.thumb_size) for d in sample_dirs)
+        results = executor.map(_scan_sample_job, jobs, chunksize=64)
+
+        for row, (sample_id, coords, thumb, error) in enumerate(results):
+            sample_ids.append(sample_id)
+
+            if coords:
+                location_index[sample_id] = coords
+                thumbnails[row] = thumb
+            elif error:
+                errors.append(f"{sample_id}: {error}")
+
+            completed = row + 1
+            if completed % 5000 == 0 or completed == total:
+                print(f"Progress: {completed}/{total} ({100*completed//total}%)")
+
+    thumbnails.flush()
+    del thumbnails
+    (output_dir / "thumbnails_ids.txt").write_text("\n".join(sample_ids) + "\n")
+    write_index(location_index, index_path, args.format)
+
+    print(f"Done! Indexed {len(location_index)} samples -> {index_path}")
+    print(f"      Thumbnails ({args.thumb_size}x{args.thumb_size}) -> {output_dir / 'thumbnails.npy'}")
+
+    if errors:
+        print(f"Warnings: {len(errors)} samples had issues")
+
+
+if __name__ == '__main__':
+    main()
@@ -10,31 +10,160 @@ Usage:
 """
 
 import argparse
+import os
 import random
 import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
+from typing import Optional
 
 import numpy as np
 import rasterio
+from rasterio.enums import Resampling
+from rasterio.errors import RasterioIOError
 from PIL import Image
 
-
-def generate_rgb_png(tif_path: Path) -> Image.Image:
-    """Read GeoTIFF and generate RGB image with percentile normalization."""
-    with rasterio.open(tif_path) as src:
-        data = src.read()
-
-        # RGB bands (Landsat OLI: B4=Red, B3=Green, B2=Blue -> indices 3,2,1)
-        rgb_indices = [3, 2, 1]
-        rgb = np.stack([data[i] for i in rgb_indices], axis=0).astype(np.float32)
-
-        # Percentile normalization (2-98%)
-        p2, p98 = np.percentile(rgb, (2, 98))
-        rgb_norm = np.clip((rgb - p2) / (p98 - p2 + 1e-8), 0, 1)
-        rgb_norm = (rgb_norm * 255).astype(np.uint8)
-
-        # Convert to PIL Image (H, W, C)
-        return Image.fromarray(np.transpose(rgb_norm, (1, 2, 0)))
+try:
+    from numba import njit, prange
+except ImportError:  # Optional: fused histogram normalization kernel
+    njit = None
+
+# --quality preset -> zlib level for PNG encoding (PIL's default is 6)
+PNG_COMPRESS_LEVELS = {
+    "fast": 1,
+    "balanced": 3,
+    "small": 6,
+}
+
+
+if njit is not None:
+    @njit(cache=True)
+    def _hist_percentile(counts, q):
+        """np.percentile (linear interpolation) computed from a value histogram."""
+        n = counts.sum()
+        pos = q / 100.0 * (n - 1)
+        lo = int(np.floor(pos))
+        frac = pos - lo
+        hi = min(lo + 1, n - 1)
+
+        # Values at sorted ranks lo and hi: first bins whose running count exceeds them
+        v_lo = v_hi = -1
+        seen = 0
+        for v in range(counts.shape[0]):
+            seen += counts[v]
+            if v_lo < 0 and seen > lo:
+                v_lo = v
+            if seen > hi:
+                v_hi = v
+                break
+        return v_lo + frac * (v_hi - v_lo)
+
+    @njit(cache=True)
+    def _channel_histogram(rgb, hist, c):
+        """Count the values of channel c of rgb into hist[c]."""
+        for y in range(rgb.shape[1]):
+            for x in range(rgb.shape[2]):
+                hist[c, rgb[c, y, x]] += 1
+
+    @njit(parallel=True, cache=True)
+    def _rgb_histograms_parallel(rgb):
+        """Exact per-channel 65536-bin histograms, one thread per channel."""
+        hist = np.zeros((rgb.shape[0], 65536), dtype=np.int64)
+        for c in prange(rgb.shape[0]):
+            _channel_histogram(rgb, hist, c)
+        return hist
+
+    @njit(cache=True)
+    def _rgb_histograms_serial(rgb):
+        hist = np.zeros((rgb.shape[0], 65536), dtype=np.int64)
+        for c in range(rgb.shape[0]):
+            _channel_histogram(rgb, hist, c)
+        return hist
+
+    @njit(cache=True)
+    def _rgb_percentiles(hist):
+        """Joint 2/98 percentiles over all channels from per-channel histograms."""
+        counts = hist.sum(axis=0)
+        return _hist_percentile(counts, 2.0), _hist_percentile(counts, 98.0)
+
+    @njit(cache=True)
+    def _stretch_row(rgb, p2, scale, out, y):
+        """Write one row of the stretched (H, W, 3) uint8 output."""
+        for x in range(rgb.shape[2]):
+            for c in range(rgb.shape[0]):
+                value = (rgb[c, y, x] - p2) * scale
+                out[y, x, c] = np.uint8(min(max(value, 0.0), 255.0))
+
+    @njit(parallel=True, cache=True)
+    def _stretch_parallel(rgb, p2, scale, out):
+        for y in prange(rgb.shape[1]):
+            _stretch_row(rgb, p2, scale, out, y)
+
+    # Numba's default threading layer hangs the interpreter on exit if a
+    # parallel kernel was launched from a non-main thread (e.g. scan_samples.py
+    # --executor thread); those callers are already parallel, so run serially.
+    # The same goes for _rgb_histograms_serial above
+    @njit(cache=True)
+    def _stretch_serial(rgb, p2, scale, out):
+        for y in range(rgb.shape[1]):
+            _stretch_row(rgb, p2, scale, out, y)
+
+
+def _normalize_rgb_numpy(rgb: np.ndarray) -> np.ndarray:
+    """2-98% percentile stretch of a (3, H, W) array to (H, W, 3) uint8."""
+    # Percentiles estimated on a 1/16 strided subsample. The cutoffs are
+    # approximate, so output can differ from a full-array np.percentile
+    # stretch by several DN (data-dependent, not bounded by 1)
+    p2, p98 = np.percentile(rgb[:, ::4, ::4], (2, 98))
+
+    # Scale and clip in place in a single float32 buffer
+    rgb_f32 = np.empty(rgb.shape, dtype=np.float32)
+    np.subtract(rgb, p2, out=rgb_f32)
+    np.multiply(rgb_f32, 255.0 / (p98 - p2 + 1e-8), out=rgb_f32)
+    np.clip(rgb_f32, 0, 255, out=rgb_f32)
+    return np.ascontiguousarray(rgb_f32.astype(np.uint8).transpose(1, 2, 0))
+
+
+def normalize_rgb(rgb: np.ndarray) -> np.ndarray:
+    """2-98% percentile stretch of a (3, H, W) array to contiguous (H, W, 3) uint8.
+
+    The Numba kernel handles integer data with a histogram instead of
+    sorting and writes HWC directly.
+    """
+    if njit is not None and rgb.dtype in (np.uint8, np.uint16):
+        _, height, width = rgb.shape
+        hwc = np.empty((height, width, 3), dtype=np.uint8)
+        if threading.current_thread() is threading.main_thread():
+            p2, p98 = _rgb_percentiles(_rgb_histograms_parallel(rgb))
+            _stretch_parallel(rgb, p2, 255.0 / (p98 - p2 + 1e-8), hwc)
+        else:
+            p2, p98 = _rgb_percentiles(_rgb_histograms_serial(rgb))
+            _stretch_serial(rgb, p2, 255.0 / (p98 - p2 + 1e-8), hwc)
+        return hwc
+    return _normalize_rgb_numpy(rgb)
+
+
+def generate_rgb_png(tif_path: Path, size: Optional[int] = None) -> Image.Image:
+    """Read GeoTIFF and generate RGB image with percentile normalization.
+
+    With size, reads a size x size image instead of full resolution; GDAL
+    serves this from overviews (build_index.py --build-overviews) if present.
+    """
+    # sharing=False: don't go through GDAL's shared-dataset pool (and its lock)
+    with rasterio.open(tif_path, sharing=False) as src:
+        # RGB bands only (Landsat OLI: B4=Red, B3=Green, B2=Blue; 1-based),
+        # so GDAL never decodes the other bands
+        if size:
+            rgb = src.read(indexes=[4, 3, 2], out_shape=(3, size, size),
+                           resampling=Resampling.average)
+        else:
+            rgb = src.read(indexes=[4, 3, 2])
+
+    # Convert to PIL Image (H, W, C)
+    _, height, width = rgb.shape
+    return Image.frombuffer('RGB', (width, height), normalize_rgb(rgb), 'raw', 'RGB', 0, 1)
 
 
 def get_season(date_str: str) -> str:
@@ -50,31 +179,48 @@ def get_season(date_str: str) -> str:
         return "fall"
 
 
-def export_sample(sample_dir: Path, output_dir: Path) -> list[Path]:
-    """Export all timestamps for a sample as PNG files."""
+def list_sample_exports(sample_dir: Path, output_dir: Path) -> list[tuple[str, Path]]:
+    """List (tif_path, output_path) pairs for all timestamps of a sample."""
     sample_id = sample_dir.name
-    exported = []
+    pairs = []
+
+    with os.scandir(sample_dir) as entries:
+        ts_dirs = sorted((e for e in entries if e.is_dir(follow_symlinks=False)),
+                         key=lambda e: e.name)
+
+    for ts_dir in ts_dirs:
+        tif_path = os.path.join(ts_dir.path, "all_bands.tif")
+
+        # Extract date and season from timestamp name
+        ts_name = ts_dir.name
+        date_str = ts_name[-8:] if len(ts_name) >= 8 else ts_name
+        season = get_season(date_str) if date_str.isdigit() else "unknown"
 
-    for ts_dir in sorted(sample_dir.iterdir()):
-        if ts_dir.is_dir():
-            tif_path = ts_dir / "all_bands.tif"
-            if tif_path.exists():
-                # Extract date and season from timestamp name
-                ts_name = ts_dir.name
-                date_str = ts_name[-8:] if len(ts_name) >= 8 else ts_name
-                season = get_season(date_str) if date_str.isdigit() else "unknown"
+        # Generate output filename
+        output_name = f"{sample_id}_{season}_{date_str}.png"
+        pairs.append((tif_path, output_dir / output_name))
 
-                # Generate output filename
-                output_name = f"{sample_id}_{season}_{date_str}.png"
-                output_path = output_dir / output_name
+    return pairs
 
-                # Generate and save PNG
-                img = generate_rgb_png(tif_path)
-                img.save(output_path)
-                exported.append(output_path)
-                print(f"  Saved: {output_name}")
 
-    return exported
+def _render_one(pair: tuple[str, Path], compress_level: int = 1,
+                size: Optional[int] = None) -> Optional[Path]:
+    """Render one GeoTIFF to PNG. Returns None if the timestamp has no GeoTIFF.
+
+    Top-level so it can be pickled for the process pool.
+    """
+    tif_path, output_path = pair
+
+    # Open directly and only stat on failure, instead of checking first
+    try:
+        img = generate_rgb_png(tif_path, size)
+    except RasterioIOError:
+        if not os.path.exists(tif_path):
+            return None
+        raise
+
+    img.save(output_path, format="PNG", compress_level=compress_level, optimize=False)
+    return output_path
 
 
 def main():
@@ -94,6 +240,12 @@ Examples:
 
   # Export from different split
   python scripts/export_samples.py --sample 0029460 --split ssl4eo_l_etm_sr
+
+  # Export 20 random samples using 8 worker processes
+  python scripts/export_samples.py --random 20 --jobs 8
+
+  # Export 66x66 previews (fast if overviews were built by build_index.py)
+  python scripts/export_samples.py --random 20 --size 66
         """
     )
 
@@ -126,6 +278,24 @@ Examples:
         default="./samples",
         help="Output directory for PNG files (default: ./samples)"
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=max(1, (os.cpu_count() or 2) // 2),
+        help="Number of worker processes (default: half the CPU count, to avoid saturating the disk)"
+    )
+    parser.add_argument(
+        "--quality",
+        choices=list(PNG_COMPRESS_LEVELS),
+        default="fast",
+        help="PNG compression preset: fast (level 1), balanced (3) or small (6) (default: fast)"
+    )
+    parser.add_argument(
+        "--size",
+        type=int,
+        default=None,
+        help="Output width/height in pixels (default: native resolution)"
+    )
 
     args = parser.parse_args()
 
@@ -140,7 +310,8 @@ Examples:
         sys.exit(1)
 
     # Get sample directories
-    all_samples = sorted([d for d in data_dir.iterdir() if d.is_dir()])
+    with os.scandir(data_dir) as entries:
+        all_samples = sorted(Path(e.path) for e in entries if e.is_dir())
     if not all_samples:
         print(f"Error: No samples found in {data_dir}")
         sys.exit(1)
@@ -162,16 +333,27 @@ Examples:
     output_dir.mkdir(parents=True, exist_ok=True)
 
     # Export samples
-    print(f"Exporting {len(samples_to_export)} sample(s) to {output_dir}/\n")
-    total_exported = 0
-
+    pairs = []
     for sample_dir in samples_to_export:
-        print(f"Sample {sample_dir.name}:")
-        exported = export_sample(sample_dir, output_dir)
-        total_exported += len(exported)
-        print()
+        pairs.extend(list_sample_exports(sample_dir, output_dir))
+
+    print(f"Exporting {len(samples_to_export)} sample(s) to {output_dir}/ "
+          f"with {args.jobs} job(s)\n")
+
+    render = partial(_render_one, compress_level=PNG_COMPRESS_LEVELS[args.quality],
+                     size=args.size)
+
+    # Timestamps are independent, so render them all in one pool
+    if args.jobs > 1:
+        with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            exported = [p for p in executor.map(render, pairs, chunksize=4) if p]
+    else:
+        exported = [p for p in map(render, pairs) if p]
+
+    for output_path in exported:
+        print(f"  Saved: {output_path.name}")
 
-    print(f"Done! Exported {total_exported} images to {output_dir}/")
+    print(f"\nDone! Exported {len(exported)} images to {output_dir}/")
 
 
 if __name__ == "__main__":
@@ -5,44 +5,143 @@ Flask server with Leaflet.js frontend for viewing satellite imagery on a map.
 """
 
 import argparse
+import atexit
+import hashlib
+import itertools
 import json
 import math
 import os
-from functools import lru_cache
+import threading
+import time
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from collections import OrderedDict
 from io import BytesIO
 from pathlib import Path
 
 import numpy as np
 import rasterio
+from rasterio.enums import Resampling
 from rasterio.warp import transform_bounds
 from flask import Flask, jsonify, request, send_file, Response
-from PIL import Image
+from PIL import Image, features
+
+try:
+    from flask_compress import Compress
+except ImportError:  # Optional: gzip/brotli for JSON and HTML responses
+    Compress = None
+
+try:
+    import orjson
+except ImportError:  # Optional: faster JSON responses
+    orjson = None
+
+try:
+    from sklearn.neighbors import BallTree
+except ImportError:  # Optional: O(log N) nearest-sample queries
+    BallTree = None
 
 app = Flask(__name__)
+if Compress is not None:
+    # Images are already compressed; only text types (JSON, HTML) are encoded
+    Compress(app)
 
 # Configuration - will be set via command line
 DATA_ROOT = None
 SPLIT = "ssl4eo_l_oli_sr"
 
-# Cache for sample list (avoid re-scanning filesystem)
+# Cache for sample list (avoid re-scanning filesystem), and its /api/samples body
 _sample_cache = None
+_samples_body = None
+
+# Per-sample bounds + timestamp names, {sample_id: {'bounds', 'timestamps'}};
+# pre-filled from sample_info_<split>.json, extended as samples are scanned
+_sample_info = {}
+
+# Directory for the persistent tile cache (None = in-memory cache only)
+TILE_CACHE_DIR = None
+
+# Allowed ?size= values for downsampled tiles (native tiles are 264x264). Kept
+# to a fixed set so clients can't grow the never-evicted disk cache at will
+TILE_SIZES = (32, 64, 128, 256)
+
+# Open rasterio datasets reused across tile renders, {(path, mtime_ns): (dataset, lock)}
+DATASET_CACHE_SIZE = 64
+_dataset_handles = OrderedDict()
+_dataset_lock = threading.Lock()
+
+# Pool rendering tiles for --precompute-tiles (cancelled on shutdown)
+_precompute_executor = None
+
+# Process pool for on-demand tile rendering (--tile-workers). Not started when
+# imported by a WSGI server; there, scale with worker processes instead
+_tile_pool = None
+
+# Location index for nearest-sample queries, as arrays: sample ids, lat/lon
+# in degrees (as stored) and in radians (for the searches below)
+_location_ids = np.empty(0, dtype=str)
+_location_lat = np.empty(0)
+_location_lon = np.empty(0)
+_location_lat_rad = np.empty(0)
+_location_lon_rad = np.empty(0)
 
-# Location index for nearest-sample queries
-_location_index = None
+# Record layout of locations.bin (scripts/build_index.py --format binary)
+LOCATION_DTYPE = np.dtype([('id', 'S7'), ('lat', '<f4'), ('lon', '<f4')])
+
+# Haversine BallTree over the index (only when scikit-learn is installed)
+_location_tree = None
+
+# Without scikit-learn: hash grid over unit-sphere xyz, {cell: [sample indices]}.
+# Cells are cubes of NEAREST_CELL_SIZE (chord length, ~64 km on the ground);
+# queries search outward ring by ring up to NEAREST_MAX_RING, then fall back
+# to a full scan (e.g. clicks far out at sea)
+NEAREST_CELL_SIZE = 0.01
+NEAREST_MAX_RING = 8
+_location_xyz = np.empty((0, 3))
+_location_grid = {}
+
+# Tiles are sent as WebP to clients that ask for it (faster to encode, smaller)
+WEBP_SUPPORTED = features.check('webp')
 
 
 def load_location_index():
-    """Load pre-computed location index from JSON file."""
-    global _location_index
+    """Load pre-computed location index (locations.bin if present, else locations.json)."""
+    global _location_ids, _location_lat, _location_lon, _location_lat_rad, _location_lon_rad
+    global _location_tree, _location_xyz, _location_grid
+    bin_path = Path(DATA_ROOT) / "locations.bin"
     index_path = Path(DATA_ROOT) / "locations.json"
-    if index_path.exists():
+    if bin_path.exists():
+        # Memory-mapped packed records: no parsing, and no per-sample Python objects
+        if bin_path.stat().st_size:
+            records = np.memmap(bin_path, dtype=LOCATION_DTYPE, mode='r')
+        else:
+            records = np.empty(0, dtype=LOCATION_DTYPE)
+        _location_ids = records['id']
+        _location_lat, _location_lon = records['lat'], records['lon']
+        print(f"Loaded location index: {len(_location_ids)} samples")
+    elif index_path.exists():
         with open(index_path) as f:
-            _location_index = json.load(f)
-        print(f"Loaded location index: {len(_location_index)} samples")
+            location_index = json.load(f)
+        _location_ids = np.array(list(location_index), dtype=str)
+        coords = np.array(list(location_index.values()), dtype=np.float64).reshape(-1, 2)
+        _location_lat, _location_lon = coords[:, 0], coords[:, 1]
+        print(f"Loaded location index: {len(_location_ids)} samples")
     else:
         print(f"Warning: Location index not found at {index_path}")
         print("Map click feature will be disabled. Run: python scripts/build_index.py")
-        _location_index = {}
+        _location_ids = np.empty(0, dtype=str)
+        _location_lat = _location_lon = np.empty(0)
+
+    _location_lat_rad = np.radians(_location_lat, dtype=np.float64)
+    _location_lon_rad = np.radians(_location_lon, dtype=np.float64)
+    coords = np.column_stack([_location_lat_rad, _location_lon_rad])
+    _location_tree = BallTree(coords, metric='haversine') if BallTree and len(coords) else None
+
+    _location_xyz = unit_vectors(_location_lat_rad, _location_lon_rad)
+    _location_grid = {}
+    if _location_tree is None:
+        cells = np.floor(_location_xyz / NEAREST_CELL_SIZE).astype(np.int64)
+        for i, cell in enumerate(map(tuple, cells.tolist())):
+            _location_grid.setdefault(cell, []).append(i)
 
 
 def haversine_distance(lat1, lon1, lat2, lon2):
@@ -61,20 +160,117 @@ def haversine_distance(lat1, lon1, lat2, lon2):
     return R * c
 
 
+def unit_vectors(lat_rad, lon_rad):
+    """Convert lat/lon (radians) to points on the unit sphere, shape (..., 3)."""
+    cos_lat = np.cos(lat_rad)
+    return np.stack([cos_lat * np.cos(lon_rad), cos_lat * np.sin(lon_rad), np.sin(lat_rad)], axis=-1)
+
+
+def _ring_offsets(k):
+    """Cell offsets on the surface of the (2k+1)^3 cube around a cell."""
+    return [o for o in itertools.product(range(-k, k + 1), repeat=3) if max(map(abs, o)) == k]
+
+
+_RING_OFFSETS = [_ring_offsets(k) for k in range(NEAREST_MAX_RING + 1)]
+
+
+def grid_nearest(lat_rad, lon_rad):
+    """Return the index of the nearest sample via the hash grid, or None if not found nearby.
+
+    Chord length is monotonic in great-circle distance, and every sample
+    outside ring k is more than k cells away along some axis, so the search
+    can stop as soon as the best chord is within k * NEAREST_CELL_SIZE.
+    """
+    query = unit_vectors(lat_rad, lon_rad)
+    cx, cy, cz = np.floor(query / NEAREST_CELL_SIZE).astype(np.int64).tolist()
+    best, best_chord = None, math.inf
+
+    for k, offsets in enumerate(_RING_OFFSETS):
+        candidates = [i for dx, dy, dz in offsets
+                      for i in _location_grid.get((cx + dx, cy + dy, cz + dz), ())]
+        if candidates:
+            chords = np.linalg.norm(_location_xyz[candidates] - query, axis=1)
+            j = int(np.argmin(chords))
+            if chords[j] < best_chord:
+                best, best_chord = candidates[j], chords[j]
+        if best_chord <= k * NEAREST_CELL_SIZE:
+            return best
+    return None
+
+
+def find_nearest(lat, lon):
+    """Return the index (into _location_ids) of the sample nearest to lat/lon."""
+    lat_rad = math.radians(lat)
+    lon_rad = math.radians(lon)
+    if _location_tree is not None:
+        _, ind = _location_tree.query([[lat_rad, lon_rad]], k=1)
+        return int(ind[0, 0])
+
+    nearest = grid_nearest(lat_rad, lon_rad)
+    if nearest is not None:
+        return nearest
+
+    # Haversine distance over the whole index at once. The haversine term a
+    # is monotonic in distance, so argmin on it directly
+    a = (np.sin((_location_lat_rad - lat_rad) / 2) ** 2 +
+         math.cos(lat_rad) * np.cos(_location_lat_rad) *
+         np.sin((_location_lon_rad - lon_rad) / 2) ** 2)
+    return int(np.argmin(a)) if a.size else None
+
+
 def get_sample_ids():
-    """Get list of all sample IDs from the data directory."""
+    """Get list of all sample IDs (from samples_<split>.txt if present, else the data directory)."""
     global _sample_cache
     if _sample_cache is None:
         data_dir = Path(DATA_ROOT) / SPLIT
-        if data_dir.exists():
+        samples_path = Path(DATA_ROOT) / f"samples_{SPLIT}.txt"
+        if samples_path.exists():
+            # Written pre-sorted by scripts/build_index.py
+            _sample_cache = samples_path.read_text().splitlines()
+        elif data_dir.exists():
             _sample_cache = sorted([d.name for d in data_dir.iterdir() if d.is_dir()])
         else:
             _sample_cache = []
     return _sample_cache
 
 
+def load_sample_info():
+    """Load pre-computed per-sample bounds and timestamps (build_index.py --sample-info)."""
+    global _sample_info
+    info_path = Path(DATA_ROOT) / f"sample_info_{SPLIT}.json"
+    if info_path.exists():
+        with open(info_path) as f:
+            _sample_info = json.load(f)
+        print(f"Loaded sample info: {len(_sample_info)} samples")
+    else:
+        _sample_info = {}
+
+
+def timestamp_info(ts_name):
+    """Return the {'name', 'season'} entry for a timestamp directory name."""
+    # Extract date part (last 8 chars) for season calculation
+    date_match_str = ts_name[-8:] if len(ts_name) >= 8 else ts_name
+    season = get_season(date_match_str) if date_match_str.isdigit() else "Unknown"
+    return {
+        'name': ts_name,
+        'season': season
+    }
+
+
 def get_sample_info(sample_id):
-    """Get metadata for a specific sample (timestamps with seasons and bounds)."""
+    """Get metadata for a specific sample (timestamps with seasons and bounds).
+
+    Served from sample_info_<split>.json when available; otherwise scans the sample
+    directory and opens its first GeoTIFF, remembering the result.
+    """
+    cached = _sample_info.get(sample_id)
+    if cached is not None:
+        return {
+            'sample_id': sample_id,
+            'timestamps': [timestamp_info(name) for name in cached['timestamps']],
+            'bounds': cached['bounds']
+        }
+
     sample_dir = Path(DATA_ROOT) / SPLIT / sample_id
     if not sample_dir.exists():
         return None
@@ -86,14 +282,7 @@ def get_sample_info(sample_id):
         if ts_dir.is_dir():
             tif_path = ts_dir / "all_bands.tif"
             if tif_path.exists():
-                ts_name = ts_dir.name
-                # Extract date part (last 8 chars) for season calculation
-                date_match_str = ts_name[-8:] if len(ts_name) >= 8 else ts_name
-                season = get_season(date_match_str) if date_match_str.isdigit() else "Unknown"
-                timestamps.append({
-                    'name': ts_name,
-                    'season': season
-                })
+                timestamps.append(timestamp_info(ts_dir.name))
 
                 # Get bounds from first file
                 if bounds_info is None:
@@ -114,6 +303,10 @@ def get_sample_info(sample_id):
                             'center_lon': (lon_min + lon_max) / 2
                         }
 
+    _sample_info[sample_id] = {
+        'timestamps': [ts['name'] for ts in timestamps],
+        'bounds': bounds_info
+    }
     return {
         'sample_id': sample_id,
         'timestamps': timestamps,
@@ -121,43 +314,270 @@ def get_sample_info(sample_id):
     }
 
 
-@lru_cache(maxsize=256)
-def generate_rgb_png_cached(tif_path_str):
-    """Read GeoTIFF and generate RGB PNG with percentile normalization.
+def fast_quantiles_2_98(bands):
+    """Return per-band (p2, p98) for a (bands, pixels) array.
 
-    Cached version - returns PNG bytes and bounds tuple for efficient re-requests.
+    Partitions once at just the ranks needed and interpolates linearly
+    between them, matching np.percentile without its general-purpose overhead.
     """
-    with rasterio.open(tif_path_str) as src:
-        # Read all bands
-        data = src.read()
+    n = bands.shape[1]
+    ranks = [0.02 * (n - 1), 0.98 * (n - 1)]
+    lo = [int(r) for r in ranks]
+    hi = [min(k + 1, n - 1) for k in lo]
+    part = np.partition(bands, sorted(set(lo + hi)), axis=1)
+    return tuple(part[:, k] + (part[:, k1] - part[:, k]) * (r - k)
+                 for r, k, k1 in zip(ranks, lo, hi))
+
+
+def band_percentiles_hist(band, lo=0.02, hi=0.98):
+    """Return (p_lo, p_hi) of an unsigned integer band from its histogram.
+
+    One bincount + cumsum pass over the raw values, no sorting; ranks are
+    interpolated linearly like np.percentile.
+    """
+    counts = np.cumsum(np.bincount(band.ravel()))
+    n = int(counts[-1])
+    result = []
+    for q in (lo, hi):
+        rank = q * (n - 1)
+        k = int(rank)
+        # Value at sorted position k is the first bin whose cumulative count exceeds k
+        v0, v1 = np.searchsorted(counts, [k, min(k + 1, n - 1)], side='right')
+        result.append(v0 + (v1 - v0) * (rank - k))
+    return result
+
+
+def open_dataset(tif_path_str):
+    """Return (dataset, lock) for a GeoTIFF, reusing open handles across requests.
+
+    Keeps up to DATASET_CACHE_SIZE handles, keyed on path and mtime so a
+    rewritten file is reopened. A handle isn't safe to read from two threads
+    at once, so callers hold its lock while reading. Evicted handles are
+    closed when the last reader drops them.
+    """
+    key = (tif_path_str, os.stat(tif_path_str).st_mtime_ns)
+    with _dataset_lock:
+        entry = _dataset_handles.get(key)
+        if entry is not None:
+            _dataset_handles.move_to_end(key)
+            return entry
+
+    # Open outside the lock; if another thread won the race, use its handle
+    src = rasterio.open(tif_path_str)
+    with _dataset_lock:
+        entry = _dataset_handles.get(key)
+        if entry is None:
+            entry = _dataset_handles[key] = (src, threading.Lock())
+            while len(_dataset_handles) > DATASET_CACHE_SIZE:
+                _dataset_handles.popitem(last=False)
+        else:
+            src.close()
+    return entry
+
 
-        # Extract RGB bands (Landsat: B4=Red, B3=Green, B2=Blue -> indices 3,2,1)
-        rgb_indices = [3, 2, 1]
-        rgb = np.stack([data[i] for i in rgb_indices], axis=0).astype(np.float32)
+@atexit.register
+def close_datasets():
+    """Close all cached dataset handles."""
+    with _dataset_lock:
+        for src, _ in _dataset_handles.values():
+            src.close()
+        _dataset_handles.clear()
 
-        # Percentile normalization
-        p2, p98 = np.percentile(rgb, (2, 98))
-        rgb_norm = np.clip((rgb - p2) / (p98 - p2 + 1e-8), 0, 1)
-        rgb_norm = (rgb_norm * 255).astype(np.uint8)
 
-        # Convert to PIL Image (H, W, C)
-        img = Image.fromarray(np.transpose(rgb_norm, (1, 2, 0)))
+def render_rgb_tile(tif_path_str, fmt='png', size=None):
+    """Read GeoTIFF and generate RGB PNG (or WebP) with percentile normalization.
+
+    With size, the longer side is downsampled to at most size pixels.
+    Returns image bytes (bounds come from /api/sample); top-level so it can
+    run in the tile pool.
+    """
+    src, lock = open_dataset(tif_path_str)
+    # Reuse of a handle is serialized; the stretch and encode run unlocked
+    with lock:
+        # Read only the RGB bands (Landsat: B4=Red, B3=Green, B2=Blue; 1-based)
+        # so GDAL never decodes the others
+        if size and size < max(src.height, src.width):
+            # Decimated read; GDAL uses overviews (build_index.py --build-overviews)
+            # when present, so fewer bytes are read and every later step is smaller
+            scale = size / max(src.height, src.width)
+            out_shape = (3, max(1, round(src.height * scale)), max(1, round(src.width * scale)))
+            rgb = src.read(indexes=[4, 3, 2], out_shape=out_shape, resampling=Resampling.average)
+        else:
+            rgb = src.read(indexes=[4, 3, 2])
+
+    # Per-band percentile normalization (one 2-98% stretch per channel).
+    # SR/TOA bands are uint16/uint8, so cutoffs come from a histogram of
+    # the raw values; the stretch is a per-band lookup table when the table
+    # is no bigger than a band (a 65536-entry uint16 table would dominate
+    # the cost of a small ?size= tile), else the float path below
+    if rgb.dtype.kind == 'u' and rgb.dtype.itemsize <= 2:
+        p2, p98 = np.array([band_percentiles_hist(b) for b in rgb], dtype=np.float32).T
+        lut_path = rgb[0].size >= np.iinfo(rgb.dtype).max + 1
+        if not lut_path:
+            rgb = rgb.astype(np.float32)
+    else:
+        lut_path = False
+        rgb = rgb.astype(np.float32)
+        p2, p98 = fast_quantiles_2_98(rgb.reshape(3, -1))
+
+    # Flat bands would divide by zero; map them to 0 instead
+    denom = np.where(p98 == p2, 1.0, p98 - p2)
+    scale = (255.0 / denom).astype(np.float32)
+    offset = (-p2 * scale).astype(np.float32)
+
+    if lut_path:
+        # One table lookup per pixel, no float math over the tile
+        values = np.arange(np.iinfo(rgb.dtype).max + 1, dtype=np.float32)
+        rgb_u8 = np.empty(rgb.shape[1:] + (3,), dtype=np.uint8)
+        for b in range(3):
+            lut = np.clip(values * scale[b] + offset[b], 0, 255).astype(np.uint8)
+            rgb_u8[..., b] = lut[rgb[b]]
+    else:
+        # Stretch in place: rgb is already our own float32 copy
+        scale, offset = scale[:, None, None], offset[:, None, None]
+        np.multiply(rgb, scale, out=rgb)
+        np.add(rgb, offset, out=rgb)
+        np.clip(rgb, 0, 255, out=rgb)
+        # Transpose to (H, W, C) as part of the uint8 cast
+        rgb_u8 = rgb.transpose(1, 2, 0).astype(np.uint8, order='C')
+
+    img = Image.fromarray(rgb_u8)
+
+    # Encode for caching; favour encode speed over size (served locally)
+    buffer = BytesIO()
+    if fmt == 'webp':
+        img.save(buffer, format='WEBP', quality=90, method=0)
+    else:
+        img.save(buffer, format='PNG', compress_level=1, optimize=False)
+    return buffer.getvalue()
+
+
+class TileMemoryCache:
+    """Thread-safe LRU cache of image bytes, bounded by their total size."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._entries[key] = value
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+
+# Rendered tiles kept in memory, LRU within a byte budget (--memory-cache-mb)
+_tile_memory_cache = TileMemoryCache(512 * 1024 * 1024)
+
+
+def generate_rgb_png_cached(tif_path_str, fmt='png', size=None):
+    """Cached version of render_rgb_tile - returns image bytes.
+
+    Keyed on the GeoTIFF's mtime too, so a file rewritten in place is
+    re-rendered. Renders in the tile process pool when one is running, so
+    concurrent requests use all cores instead of contending for the GIL.
+    """
+    key = (tif_path_str, os.stat(tif_path_str).st_mtime_ns, fmt, size)
+    cached = _tile_memory_cache.get(key)
+    if cached is not None:
+        return cached
+
+    if _tile_pool is not None:
+        value = _tile_pool.submit(render_rgb_tile, tif_path_str, fmt, size).result()
+    else:
+        value = render_rgb_tile(tif_path_str, fmt, size)
+    _tile_memory_cache.put(key, value)
+    return value
 
-        # Get bounds for the response
-        bounds = src.bounds
-        crs = src.crs
-        lon_min, lat_min, lon_max, lat_max = transform_bounds(
-            crs, 'EPSG:4326',
-            bounds.left, bounds.bottom, bounds.right, bounds.top
-        )
 
-        # Convert to PNG bytes for caching
-        buffer = BytesIO()
-        img.save(buffer, format='PNG')
-        png_bytes = buffer.getvalue()
+def load_tile(tif_path, fmt, size=None):
+    """Return a tile as image bytes, or as a Path on a disk-cache hit.
 
-        # Return as tuple (hashable for cache key comparison)
-        return png_bytes, (lat_min, lat_max, lon_min, lon_max)
+    The disk cache survives restarts. Entries are keyed on path, mtime,
+    format and size, so a rewritten GeoTIFF gets a fresh tile.
+    """
+    if TILE_CACHE_DIR is None:
+        return generate_rgb_png_cached(str(tif_path), fmt, size)
+
+    stat = tif_path.stat()
+    key = f"{tif_path}|{stat.st_mtime_ns}|{fmt}" + (f"|{size}" if size else "")
+    key = hashlib.sha1(key.encode()).hexdigest()
+    image_path = TILE_CACHE_DIR / f"{key}.{fmt}"
+    if image_path.exists():
+        return image_path
+
+    image_bytes = generate_rgb_png_cached(str(tif_path), fmt, size)
+    # Write via a temp file + rename so concurrent requests never see a partial file
+    tmp_path = image_path.with_name(f"{image_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp_path.write_bytes(image_bytes)
+    os.replace(tmp_path, image_path)
+    return image_bytes
+
+
+def _init_precompute_worker(cache_dir):
+    """Point a precompute worker at the tile cache (globals aren't inherited under spawn)."""
+    global TILE_CACHE_DIR, _tile_pool, _tile_memory_cache
+    TILE_CACHE_DIR = cache_dir
+    # Render in the worker itself, not through a forked copy of the server's pool,
+    # and don't hold finished tiles in memory (they are on disk)
+    _tile_pool = None
+    _tile_memory_cache = TileMemoryCache(0)
+
+
+def _precompute_tile(job):
+    """Render one (tif_path, fmt) job into the disk cache; top-level so it can be pickled."""
+    tif_path, fmt = job
+    try:
+        load_tile(Path(tif_path), fmt)
+    except Exception:
+        return False
+    return True
+
+
+def precompute_tiles():
+    """Render every tile into the disk cache with a process pool; already cached tiles are skipped."""
+    # The frontend asks for WebP whenever the server can produce it
+    fmt = 'webp' if WEBP_SUPPORTED else 'png'
+    data_dir = Path(DATA_ROOT) / SPLIT
+    jobs = []
+    skipped = 0
+    for sample_id in get_sample_ids():
+        try:
+            with os.scandir(data_dir / sample_id) as entries:
+                jobs.extend((os.path.join(e.path, "all_bands.tif"), fmt)
+                            for e in entries if e.is_dir(follow_symlinks=False))
+        except OSError:
+            skipped += 1  # Listed in samples_<split>.txt but missing/unreadable on disk
+    if skipped:
+        print(f"Precompute: skipped {skipped} unreadable sample directories")
+
+    global _precompute_executor
+    start = time.time()
+    _precompute_executor = ProcessPoolExecutor(initializer=_init_precompute_worker,
+                                               initargs=(TILE_CACHE_DIR,))
+    with _precompute_executor as executor:
+        try:
+            done = sum(executor.map(_precompute_tile, jobs, chunksize=16))
+        except CancelledError:
+            return  # Server shutting down
+    print(f"Precomputed {done}/{len(jobs)} tiles in {time.time() - start:.0f}s")
 
 
 def get_season(date_str):
@@ -173,13 +593,29 @@ def get_season(date_str):
         return "Fall"
 
 
+def json_bytes(obj):
+    """Serialize obj to JSON bytes (orjson when available)."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, separators=(',', ':')).encode()
+
+
+def json_response(obj):
+    """JSON response without going through jsonify's stdlib encoder."""
+    return Response(json_bytes(obj), mimetype='application/json')
+
+
 # ============== API Routes ==============
 
 @app.route('/api/samples')
 def api_samples():
     """Return list of all sample IDs."""
-    samples = get_sample_ids()
-    return jsonify({'samples': samples, 'count': len(samples)})
+    global _samples_body
+    # The sample list is static, so serialize it once
+    if _samples_body is None:
+        samples = get_sample_ids()
+        _samples_body = json_bytes({'samples': samples, 'count': len(samples)})
+    return Response(_samples_body, mimetype='application/json')
 
 
 @app.route('/api/sample/<sample_id>')
@@ -188,28 +624,39 @@ def api_sample_info(sample_id):
     info = get_sample_info(sample_id)
     if info is None:
         return jsonify({'error': 'Sample not found'}), 404
-    return jsonify(info)
+    return json_response(info)
 
 
 @app.route('/api/tile/<sample_id>/<timestamp>')
 def api_tile(sample_id, timestamp):
-    """Return RGB PNG for a specific sample and timestamp."""
+    """Return RGB PNG (WebP if the client accepts it) for a specific sample and timestamp.
+
+    Optional ?size=N (one of TILE_SIZES) downsamples the longer side to at most N pixels.
+    """
     tif_path = Path(DATA_ROOT) / SPLIT / sample_id / timestamp / "all_bands.tif"
 
     if not tif_path.exists():
         return jsonify({'error': 'File not found'}), 404
 
     try:
-        # Use cached function (returns PNG bytes and bounds tuple)
-        png_bytes, bounds_tuple = generate_rgb_png_cached(str(tif_path))
-        lat_min, lat_max, lon_min, lon_max = bounds_tuple
-
-        response = send_file(BytesIO(png_bytes), mimetype='image/png')
-        # Add bounds as headers for the frontend
-        response.headers['X-Bounds-LatMin'] = str(lat_min)
-        response.headers['X-Bounds-LatMax'] = str(lat_max)
-        response.headers['X-Bounds-LonMin'] = str(lon_min)
-        response.headers['X-Bounds-LonMax'] = str(lon_max)
+        size = int(request.args['size']) if 'size' in request.args else None
+    except ValueError:
+        size = 0
+    if size is not None and size not in TILE_SIZES:
+        return jsonify({'error': f'Invalid size parameter (allowed: {list(TILE_SIZES)})'}), 400
+
+    # Only an explicit image/webp counts; */* (plain fetch, curl) keeps getting PNG
+    webp = WEBP_SUPPORTED and 'image/webp' in request.accept_mimetypes.values()
+    fmt = 'webp' if webp else 'png'
+
+    try:
+        # Cached tile: a file from the disk cache (sent with sendfile) or bytes.
+        # Bounds are the same for every timestamp, so the frontend takes them
+        # from /api/sample instead
+        image = load_tile(tif_path, fmt, size)
+        body = image if isinstance(image, Path) else BytesIO(image)
+        response = send_file(body, mimetype=f'image/{fmt}')
+        response.headers['Vary'] = 'Accept'
         return response
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -218,7 +665,7 @@ def api_tile(sample_id, timestamp):
 @app.route('/api/nearest')
 def api_nearest():
     """Find the nearest sample to a given lat/lon coordinate."""
-    if not _location_index:
+    if not len(_location_ids):
         return jsonify({'error': 'Location index not loaded. Run: python scripts/build_index.py'}), 503
 
     try:
@@ -227,25 +674,23 @@ def api_nearest():
     except (TypeError, ValueError):
         return jsonify({'error': 'Invalid lat/lon parameters'}), 400
 
-    # Find nearest sample using Haversine distance
-    nearest_id = None
-    min_distance = float('inf')
-
-    for sample_id, coords in _location_index.items():
-        sample_lat, sample_lon = coords
-        dist = haversine_distance(lat, lon, sample_lat, sample_lon)
-        if dist < min_distance:
-            min_distance = dist
-            nearest_id = sample_id
-
-    if nearest_id is None:
+    # Find nearest sample, then compute the Haversine distance for it only
+    nearest = find_nearest(lat, lon)
+    if nearest is None:
         return jsonify({'error': 'No samples in index'}), 404
 
-    return jsonify({
-        'sample_id': nearest_id,
+    nearest_id = _location_ids[nearest]
+    if isinstance(nearest_id, bytes):
+        nearest_id = nearest_id.decode()
+    sample_lat = float(_location_lat[nearest])
+    sample_lon = float(_location_lon[nearest])
+    min_distance = haversine_distance(lat, lon, sample_lat, sample_lon)
+
+    return json_response({
+        'sample_id': str(nearest_id),
         'distance_km': min_distance,
-        'sample_lat': _location_index[nearest_id][0],
-        'sample_lon': _location_index[nearest_id][1]
+        'sample_lat': sample_lat,
+        'sample_lon': sample_lon
     })
 
 
@@ -522,7 +967,9 @@ HTML_TEMPLATE = '''
 
                 // Fetch all tiles in parallel for better performance
                 const tilePromises = info.timestamps.map(ts =>
-                    fetch(`/api/tile/${sampleId}/${ts.name}`)
+                    fetch(`/api/tile/${sampleId}/${ts.name}`, {
+                        headers: {'Accept': 'image/webp,image/png'}
+                    })
                 );
                 const tileResponses = await Promise.all(tilePromises);
 
@@ -536,16 +983,11 @@ HTML_TEMPLATE = '''
                     const blob = await tileResponse.blob();
                     const imageUrl = URL.createObjectURL(blob);
 
-                    // Get bounds from headers
-                    const latMin = parseFloat(tileResponse.headers.get('X-Bounds-LatMin'));
-                    const latMax = parseFloat(tileResponse.headers.get('X-Bounds-LatMax'));
-                    const lonMin = parseFloat(tileResponse.headers.get('X-Bounds-LonMin'));
-                    const lonMax = parseFloat(tileResponse.headers.get('X-Bounds-LonMax'));
-
-                    // Create image overlay with current opacity
+                    // Create image overlay with current opacity (all timestamps
+                    // share the sample bounds)
                     const overlay = L.imageOverlay(
                         imageUrl,
-                        [[latMin, lonMin], [latMax, lonMax]],
+                        [[bounds.lat_min, bounds.lon_min], [bounds.lat_max, bounds.lon_max]],
                         { opacity: currentOpacity }
                     );
 
@@ -648,7 +1090,7 @@ def index():
 # ============== Main ==============
 
 def main():
-    global DATA_ROOT, SPLIT
+    global DATA_ROOT, SPLIT, TILE_CACHE_DIR, _tile_pool, _tile_memory_cache
 
     parser = argparse.ArgumentParser(description='SSL4EO-L GeoTIFF Viewer')
     parser.add_argument('--root', type=str, default='./data',
@@ -659,23 +1101,58 @@ def main():
                         help='Port to run the server on')
     parser.add_argument('--host', type=str, default='127.0.0.1',
                         help='Host to bind to')
+    parser.add_argument('--tile-cache', type=str, default=None,
+                        help='Directory for the persistent tile cache (default: <root>/.tile_cache)')
+    parser.add_argument('--no-tile-cache', action='store_true',
+                        help='Only cache tiles in memory')
+    parser.add_argument('--precompute-tiles', action='store_true',
+                        help='Render all tiles into the tile cache in the background at startup')
+    parser.add_argument('--memory-cache-mb', type=int, default=512,
+                        help='Memory budget for rendered tiles in MB (default: 512)')
+    parser.add_argument('--tile-workers', type=int, default=os.cpu_count(),
+                        help='Processes for rendering tiles (default: CPU count; '
+                             '0 renders in the request threads)')
 
     args = parser.parse_args()
+    if args.precompute_tiles and args.no_tile_cache:
+        parser.error("--precompute-tiles needs the tile cache")
 
     DATA_ROOT = args.root
     SPLIT = args.split
+    if not args.no_tile_cache:
+        TILE_CACHE_DIR = Path(args.tile_cache or Path(DATA_ROOT) / '.tile_cache')
+        TILE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
     print(f"Starting SSL4EO-L GeoTIFF Viewer")
     print(f"  Data root: {DATA_ROOT}")
     print(f"  Split: {SPLIT}")
+    print(f"  Tile cache: {TILE_CACHE_DIR or 'memory only'}")
     print(f"  Server: http://{args.host}:{args.port}")
     print()
 
-    # Load location index for map-click feature
+    # Load location index for map-click feature, and precomputed sample metadata
     load_location_index()
+    load_sample_info()
     print()
 
-    app.run(host=args.host, port=args.port, debug=False, threaded=True)
+    _tile_memory_cache = TileMemoryCache(args.memory_cache_mb * 1024 * 1024)
+    # Generous GDAL block cache so reused dataset handles stay warm (inherited by workers)
+    os.environ.setdefault('GDAL_CACHEMAX', '512')
+    if args.tile_workers > 0:
+        _tile_pool = ProcessPoolExecutor(max_workers=args.tile_workers)
+
+    if args.precompute_tiles:
+        print("Precomputing tiles in the background...")
+        threading.Thread(target=precompute_tiles, daemon=True).start()
+
+    try:
+        app.run(host=args.host, port=args.port, debug=False, threaded=True)
+    finally:
+        # Don't make Ctrl+C wait for the remaining precompute jobs
+        if _precompute_executor is not None:
+            _precompute_executor.shutdown(wait=False, cancel_futures=True)
+        if _tile_pool is not None:
+            _tile_pool.shutdown(wait=False, cancel_futures=True)
 
 
 if __name__ == '__main__':